@@ -2,18 +2,86 @@ import os
 import json
 import schedule
 import time
-from datetime import datetime
+import sqlite3
+from datetime import datetime, timedelta, timezone
 from instagrapi import Client
 from instagrapi.exceptions import LoginRequired
+from instagrapi.extractors import extract_comment
 import openai
 from dotenv import load_dotenv
 import requests
 
 load_dotenv()
 
+MEDIA_PAGE_SIZE = 33
+
+class CommentSyncState:
+    """Persistent per-media comment sync state backed by SQLite"""
+    
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS media_sync (
+                media_id TEXT PRIMARY KEY,
+                last_comment_pk INTEGER NOT NULL DEFAULT 0,
+                comment_count INTEGER
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "INSERT OR IGNORE INTO sync_meta (key, value) VALUES ('started_at', ?)",
+            (datetime.now(timezone.utc).isoformat(),)
+        )
+        self.conn.commit()
+    
+    @property
+    def started_at(self) -> datetime:
+        """When this sync state was first created"""
+        row = self.conn.execute(
+            "SELECT value FROM sync_meta WHERE key = 'started_at'"
+        ).fetchone()
+        return datetime.fromisoformat(row[0])
+    
+    def get(self, media_id: str):
+        """Return (last_comment_pk, comment_count) for a media, or None if never synced"""
+        row = self.conn.execute(
+            "SELECT last_comment_pk, comment_count FROM media_sync WHERE media_id = ?",
+            (media_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+    
+    def set_last_comment(self, media_id: str, comment_pk: int):
+        """Checkpoint the newest comment handled on a media"""
+        self.conn.execute(
+            """
+            INSERT INTO media_sync (media_id, last_comment_pk) VALUES (?, ?)
+            ON CONFLICT(media_id) DO UPDATE SET
+                last_comment_pk = MAX(last_comment_pk, excluded.last_comment_pk)
+            """,
+            (media_id, comment_pk)
+        )
+        self.conn.commit()
+    
+    def set_comment_count(self, media_id: str, comment_count: int):
+        """Record the comment count the media had once fully synced"""
+        self.conn.execute(
+            """
+            INSERT INTO media_sync (media_id, comment_count) VALUES (?, ?)
+            ON CONFLICT(media_id) DO UPDATE SET comment_count = excluded.comment_count
+            """,
+            (media_id, comment_count)
+        )
+        self.conn.commit()
+
 class InstagramCarnivoreBot:
     def __init__(self):
         self.client = Client()
+        self.sync_state = CommentSyncState(os.getenv("INSTAGRAM_SYNC_DB", "instagram_sync.db"))
+        self.comment_window_days = int(os.getenv("INSTAGRAM_COMMENT_WINDOW_DAYS", "30"))
         self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.hashtags = [
             "#CarnivoreDiet", "#Carnivore", "#Keto", "#LowCarb",
@@ -130,23 +198,104 @@ class InstagramCarnivoreBot:
             print(f"❌ Post failed: {e}")
             return False
     
-    def respond_to_comments(self):
-        """Auto-respond to comments using AI"""
-        # Get recent posts
+    def recent_medias(self):
+        """Yield our posts newer than the comment window"""
         user_id = self.client.user_id
-        media = self.client.user_medias(user_id, amount=5)
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.comment_window_days)
+        end_cursor = ""
         
-        for post in media:
-            comments = self.client.media_comments(post.id, amount=20)
-            
-            for comment in comments:
-                if not comment.replied:
+        while True:
+            medias, end_cursor = self.client.user_medias_paginated(
+                user_id, amount=MEDIA_PAGE_SIZE, end_cursor=end_cursor
+            )
+            # Pinned posts come first whatever their age, so an old post does
+            # not end the window; only a page with nothing recent left does.
+            in_window = [media for media in medias if media.taken_at >= cutoff]
+            yield from in_window
+            if not in_window or not end_cursor:
+                return
+    
+    def comments_page(self, media_id: str, max_id: str = None):
+        """Fetch one page of top-level comments, newest first, and the cursor to older ones"""
+        # Same endpoint and paging as Client.media_comments; media_comments_chunk
+        # only follows min_id and cannot walk back to older pages.
+        params = {"max_id": max_id} if max_id else None
+        result = self.client.private_request(f"media/{media_id}/comments/", params)
+        comments = [extract_comment(comment) for comment in result.get("comments", [])]
+        next_max_id = result.get("next_max_id") if result.get("has_more_comments") else None
+        return comments, next_max_id
+    
+    def new_comments(self, media_id: str, last_comment_pk: int):
+        """Fetch comments newer than last_comment_pk, oldest first"""
+        # Page backward until a page reaches the cursor or there are no older
+        # comments left, so every comment past the cursor has been seen.
+        new = []
+        max_id = None
+        
+        while True:
+            comments, max_id = self.comments_page(media_id, max_id)
+            new.extend(c for c in comments if int(c.pk) > last_comment_pk)
+            if any(int(c.pk) <= last_comment_pk for c in comments) or not max_id:
+                break
+        
+        return sorted(new, key=lambda c: int(c.pk))
+    
+    def respond_to_comments(self):
+        """Auto-respond to new comments using AI"""
+        user_id = str(self.client.user_id)
+        started_at = self.sync_state.started_at
+        
+        try:
+            for post in self.recent_medias():
+                try:
+                    self.sync_post_comments(post, user_id, started_at)
+                except Exception as e:
+                    print(f"❌ Comment sync failed for post {post.id}: {e}")
+        except Exception as e:
+            print(f"❌ Fetching recent posts failed: {e}")
+    
+    def sync_post_comments(self, post, user_id: str, started_at: datetime):
+        """Reply to comments on a post that arrived since its last sync"""
+        state = self.sync_state.get(post.id)
+        
+        if state is None and post.taken_at < started_at:
+            # Posts that predate the sync state are bootstrapped: their
+            # existing comments become the cursor without being answered.
+            comments = self.new_comments(post.id, 0)
+            if comments:
+                self.sync_state.set_last_comment(post.id, int(comments[-1].pk))
+            self.sync_state.set_comment_count(post.id, post.comment_count)
+            return
+        
+        last_comment_pk, comment_count = state or (0, None)
+        
+        # The media listing already carries comment counts, so untouched
+        # posts cost no extra requests. A deleted comment and a new one
+        # between runs leave the count unchanged; the new comment then waits
+        # until the count moves again. The listing has no newest-comment
+        # field to compare instead, so this is an accepted trade-off.
+        if comment_count is not None and comment_count == post.comment_count:
+            return
+        
+        for comment in self.new_comments(post.id, last_comment_pk):
+            if str(comment.user.pk) != user_id:
+                try:
                     # Generate AI response
                     ai_response = self.generate_comment_response(comment.text)
                     
                     # Reply to comment
-                    self.client.media_comment(post.id, ai_response, replied_to_comment_id=comment.id)
+                    self.client.media_comment(post.id, ai_response, replied_to_comment_id=comment.pk)
                     print(f"✅ Replied to comment: {comment.text[:50]}...")
+                except Exception as e:
+                    # Move past it so one bad comment cannot block the post
+                    print(f"❌ Reply to comment {comment.pk} failed: {e}")
+            
+            self.sync_state.set_last_comment(post.id, int(comment.pk))
+        
+        # The count also includes thread replies (ours and followers'),
+        # which the comments endpoint does not return. Those cost one empty
+        # refetch on the next run, after which the recorded count settles.
+        self.sync_state.set_comment_count(post.id, post.comment_count)
     
     def generate_comment_response(self, comment_text: str) -> str:
         """Generate AI response to comments"""
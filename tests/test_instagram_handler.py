@@ -0,0 +1,228 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+
+def stub_module(name, **attrs):
+    module = ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules.setdefault(name, module)
+
+
+# The bot's third-party dependencies are only needed at import time here;
+# every call into them goes through the stubbed client below.
+for name, attrs in {
+    "instagrapi": {"Client": object},
+    "instagrapi.exceptions": {"LoginRequired": Exception},
+    "instagrapi.extractors": {"extract_comment": None},
+    "openai": {},
+    "schedule": {},
+    "dotenv": {"load_dotenv": lambda: None},
+    "requests": {},
+}.items():
+    try:
+        __import__(name)
+    except ImportError:
+        stub_module(name, **attrs)
+
+import instagram_handler
+from instagram_handler import CommentSyncState, InstagramCarnivoreBot
+
+BOT_ID = "1"
+NOW = datetime.now(timezone.utc)
+
+
+def make_media(media_id, age_days, comment_count):
+    return SimpleNamespace(
+        id=media_id, taken_at=NOW - timedelta(days=age_days), comment_count=comment_count
+    )
+
+
+def make_comment(pk, user_pk="2"):
+    return {"pk": str(pk), "text": f"comment {pk}", "user": {"pk": user_pk}}
+
+
+@pytest.fixture(autouse=True)
+def fake_extract_comment(monkeypatch):
+    monkeypatch.setattr(
+        instagram_handler,
+        "extract_comment",
+        lambda data: SimpleNamespace(
+            pk=data["pk"], text=data["text"], user=SimpleNamespace(**data["user"])
+        ),
+    )
+
+
+class FakeClient:
+    def __init__(self, media_pages, comments, page_size=2, fail_on_reply=None):
+        self.user_id = BOT_ID
+        self.media_pages = media_pages
+        self.comments = comments
+        self.page_size = page_size
+        self.fail_on_reply = fail_on_reply
+        self.media_calls = 0
+        self.comment_calls = 0
+        self.replies = []
+
+    def user_medias_paginated(self, user_id, amount, end_cursor=""):
+        self.media_calls += 1
+        page = int(end_cursor or 0)
+        next_cursor = str(page + 1) if page + 1 < len(self.media_pages) else ""
+        return self.media_pages[page], next_cursor
+
+    def private_request(self, endpoint, params=None):
+        # Comments are stored newest first; max_id walks back to older pages
+        self.comment_calls += 1
+        media_id = endpoint.split("/")[1]
+        comments = self.comments.get(media_id, [])
+        start = int((params or {}).get("max_id", 0))
+        end = start + self.page_size
+        result = {"comments": comments[start:end], "has_more_comments": end < len(comments)}
+        if end < len(comments):
+            result["next_max_id"] = str(end)
+        return result
+
+    def media_comment(self, media_id, text, replied_to_comment_id):
+        if replied_to_comment_id == self.fail_on_reply:
+            raise RuntimeError("reply failed")
+        self.replies.append((media_id, replied_to_comment_id))
+
+
+def make_bot(tmp_path, client):
+    bot = InstagramCarnivoreBot.__new__(InstagramCarnivoreBot)
+    bot.client = client
+    bot.sync_state = CommentSyncState(str(tmp_path / "sync.db"))
+    bot.comment_window_days = 30
+    bot.generate_comment_response = lambda text: "thanks!"
+    set_started_at(bot, NOW - timedelta(days=365))
+    return bot
+
+
+def set_started_at(bot, started_at):
+    bot.sync_state.conn.execute(
+        "UPDATE sync_meta SET value = ? WHERE key = 'started_at'", (started_at.isoformat(),)
+    )
+
+
+def test_new_comments_stops_paging_at_cursor(tmp_path):
+    client = FakeClient([[]], {"m": [make_comment(pk) for pk in (9, 8, 7, 6, 5, 4, 3)]})
+    bot = make_bot(tmp_path, client)
+
+    comments = bot.new_comments("m", 6)
+
+    assert [c.pk for c in comments] == ["7", "8", "9"]
+    assert client.comment_calls == 2
+
+
+def test_new_comments_follow_older_pages_until_cursor(tmp_path):
+    # New comments beyond the first page must not be lost
+    client = FakeClient([[]], {"m": [make_comment(pk) for pk in range(9, 0, -1)]})
+    bot = make_bot(tmp_path, client)
+
+    comments = bot.new_comments("m", 3)
+
+    assert [c.pk for c in comments] == ["4", "5", "6", "7", "8", "9"]
+    assert client.comment_calls == 4
+
+
+def test_old_pinned_post_does_not_end_window(tmp_path):
+    pages = [
+        [make_media("pinned", 400, 0), make_media("recent", 1, 0)],
+        [make_media("old", 60, 0)],
+        [make_media("older", 90, 0)],
+    ]
+    client = FakeClient(pages, {})
+    bot = make_bot(tmp_path, client)
+
+    assert [m.id for m in bot.recent_medias()] == ["recent"]
+    assert client.media_calls == 2
+
+
+def test_unsynced_post_with_unknown_count_is_synced(tmp_path):
+    client = FakeClient([[make_media("m", 1, None)]], {"m": [make_comment(10)]})
+    bot = make_bot(tmp_path, client)
+
+    bot.respond_to_comments()
+
+    assert client.replies == [("m", "10")]
+
+
+def test_posts_predating_sync_state_are_bootstrapped_without_replies(tmp_path):
+    client = FakeClient([[make_media("m", 1, 2)]], {"m": [make_comment(11), make_comment(10)]})
+    bot = make_bot(tmp_path, client)
+    set_started_at(bot, NOW - timedelta(hours=1))
+
+    bot.respond_to_comments()
+    assert client.replies == []
+    assert bot.sync_state.get("m") == (11, 2)
+
+    client.comments["m"].insert(0, make_comment(12))
+    client.media_pages[0][0].comment_count = 3
+    bot.respond_to_comments()
+    assert client.replies == [("m", "12")]
+
+
+def test_unchanged_count_skips_comment_fetch(tmp_path):
+    client = FakeClient([[make_media("m", 1, 1)]], {"m": [make_comment(10)]})
+    bot = make_bot(tmp_path, client)
+
+    bot.respond_to_comments()
+    calls = client.comment_calls
+    bot.respond_to_comments()
+
+    assert client.comment_calls == calls
+    assert client.replies == [("m", "10")]
+
+
+def test_failing_reply_does_not_stop_other_posts(tmp_path):
+    pages = [[make_media("a", 1, 2), make_media("b", 1, 1)]]
+    comments = {"a": [make_comment(11), make_comment(10)], "b": [make_comment(20)]}
+    client = FakeClient(pages, comments, fail_on_reply="10")
+    bot = make_bot(tmp_path, client)
+
+    bot.respond_to_comments()
+
+    assert client.replies == [("a", "11"), ("b", "20")]
+    assert bot.sync_state.get("a") == (11, 2)
+
+
+def test_failed_comment_fetch_leaves_cursor_untouched(tmp_path):
+    comments = {"m": [make_comment(pk) for pk in (13, 12, 11, 10)]}
+    client = FakeClient([[make_media("m", 1, 4)]], comments)
+    bot = make_bot(tmp_path, client)
+    fetch = client.private_request
+    client.private_request = lambda endpoint, params=None: (
+        fetch(endpoint, params) if not params else 1 / 0
+    )
+
+    bot.respond_to_comments()
+    assert client.replies == []
+    assert bot.sync_state.get("m") is None
+
+    client.private_request = fetch
+    bot.respond_to_comments()
+    assert client.replies == [("m", "10"), ("m", "11"), ("m", "12"), ("m", "13")]
+
+
+def test_crash_resumes_from_last_checkpoint(tmp_path):
+    comments = [make_comment(pk) for pk in (13, 12, 11, 10)]
+    client = FakeClient([[make_media("m", 1, 4)]], {"m": comments})
+    bot = make_bot(tmp_path, client)
+    reply = client.media_comment
+
+    def killed_on_12(media_id, text, replied_to_comment_id):
+        if replied_to_comment_id == "12":
+            raise KeyboardInterrupt
+        reply(media_id, text, replied_to_comment_id)
+
+    client.media_comment = killed_on_12
+    with pytest.raises(KeyboardInterrupt):
+        bot.respond_to_comments()
+    assert bot.sync_state.get("m") == (11, None)
+
+    client.media_comment = reply
+    bot.respond_to_comments()
+
+    assert client.replies == [("m", "10"), ("m", "11"), ("m", "12"), ("m", "13")]